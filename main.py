@@ -9,30 +9,35 @@ URLs for route planning.
 """
 
 import argparse
+import csv
+import io
+import logging
 import os
-import shutil
-import tempfile
+import time
 import uuid
+import zipfile
+from functools import lru_cache
+from itertools import chain, repeat
+from operator import itemgetter
 from pathlib import Path
 
-import pandas as pd
-
-from src.gen_gtfs import (
-    AGENCY,
-    CALENDAR,
-    CALENDAR_DATES,
-    FEED_INFO,
-    ROUTES,
-    STOPS,
-    TRIPS,
-)
-from src.gtfs_lib import linestring_from_geojson
+# src.gen_gtfs is imported inside the commands that need it so
+# that `-h` and the lighter subcommands don't pay their import cost
+from src.gtfs_lib import linestrings_from_geojson_collection
 from src.brouter import generate_brouter_urls, update_stop_positions_from_url
 
 # Script directory and output paths
 script_dir = os.path.dirname(os.path.realpath(__file__))
 feed_path = Path(script_dir) / "columbia_county_gtfs"
 
+# Input files and directories, resolved once
+SCRIPT_DIR = Path(script_dir)
+STOPS_CSV = SCRIPT_DIR / "stops.csv"
+NOGOS_CSV = SCRIPT_DIR / "nogos.csv"
+GUIDES_CSV = SCRIPT_DIR / "guides.csv"
+STRAIGHTS_CSV = SCRIPT_DIR / "straights.csv"
+SHAPES_DIR = SCRIPT_DIR / "shapes"
+
 
 def load_nogos_from_csv():
     """
@@ -41,25 +46,33 @@ def load_nogos_from_csv():
     Returns:
         Dict mapping shape_id to list of (lon, lat, radius) tuples
     """
-    nogos_csv_path = Path(script_dir) / "nogos.csv"
-    
     # Return empty dict if file doesn't exist or is empty
-    if not nogos_csv_path.exists():
+    if not NOGOS_CSV.exists():
         return {}
     
+    return _read_nogos_csv(NOGOS_CSV, NOGOS_CSV.stat().st_mtime_ns)
+
+
+@lru_cache(maxsize=None)
+def _read_nogos_csv(nogos_csv_path, mtime_ns):
+    """
+    Parse nogos.csv, memoized on its path and modification time.
+    
+    The returned dict is shared between calls and must not be modified.
+    """
     try:
-        df = pd.read_csv(nogos_csv_path)
-        
-        # Return empty dict if CSV is empty or missing required columns
-        if df.empty or not all(col in df.columns for col in ['shape_id', 'stop_lat', 'stop_lon', 'radius']):
-            return {}
-        
-        nogos_dict = {}
-        for _, row in df.iterrows():
-            shape_id = row["shape_id"]
-            if shape_id not in nogos_dict:
-                nogos_dict[shape_id] = []
-            nogos_dict[shape_id].append((row["stop_lon"], row["stop_lat"], int(row["radius"])))
+        with open(nogos_csv_path, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            
+            # Return empty dict if CSV is empty or missing required columns
+            if not reader.fieldnames or not {'shape_id', 'stop_lat', 'stop_lon', 'radius'}.issubset(reader.fieldnames):
+                return {}
+            
+            nogos_dict = {}
+            for row in reader:
+                nogos_dict.setdefault(row["shape_id"], []).append(
+                    (float(row["stop_lon"]), float(row["stop_lat"]), int(float(row["radius"])))
+                )
         
         return nogos_dict
         
@@ -73,34 +86,51 @@ def load_guides_from_csv():
     Load guide points from guides.csv.
     
     Returns:
-        Dict mapping shape_id to list of (lon, lat, position) tuples, where position
-        is the index in the stop sequence where the guide point should be inserted
+        Dict mapping shape_id to list of (lon, lat, position, order) tuples sorted by
+        order, where position is the index in the stop sequence where the guide point
+        should be inserted
     """
-    guides_csv_path = Path(script_dir) / "guides.csv"
-    
     # Return empty dict if file doesn't exist or is empty
-    if not guides_csv_path.exists():
+    if not GUIDES_CSV.exists():
         return {}
     
+    return _read_guides_csv(GUIDES_CSV, GUIDES_CSV.stat().st_mtime_ns)
+
+
+@lru_cache(maxsize=None)
+def _read_guides_csv(guides_csv_path, mtime_ns):
+    """
+    Parse guides.csv, memoized on its path and modification time.
+    
+    The returned dict is shared between calls and must not be modified.
+    """
     try:
-        df = pd.read_csv(guides_csv_path)
-        
-        # Return empty dict if CSV is empty or missing required columns
-        if df.empty or not all(col in df.columns for col in ['shape_id', 'stop_lat', 'stop_lon', 'position']):
-            return {}
+        with open(guides_csv_path, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            
+            # Return empty dict if CSV is empty or missing required columns
+            if not reader.fieldnames or not {'shape_id', 'stop_lat', 'stop_lon', 'position'}.issubset(reader.fieldnames):
+                return {}
+            
+            # Include order if available, otherwise default to 0; integers go through
+            # float() since files written by pandas may hold them as e.g. "0.0"
+            guides = [
+                (
+                    row["shape_id"],
+                    float(row["stop_lon"]),
+                    float(row["stop_lat"]),
+                    int(float(row["position"])),
+                    int(float(row.get("order") or 0)),
+                )
+                for row in reader
+            ]
         
+        # Sort guides by shape and order once so every shape's list is built already in
+        # waypoint sequence and consumers never need to re-sort it
+        guides.sort(key=itemgetter(0, 4))
         guides_dict = {}
-        for _, row in df.iterrows():
-            shape_id = row["shape_id"]
-            if shape_id not in guides_dict:
-                guides_dict[shape_id] = []
-            # Include order if available, otherwise default to 0
-            order = int(row["order"]) if "order" in row and pd.notna(row["order"]) else 0
-            guides_dict[shape_id].append((row["stop_lon"], row["stop_lat"], int(row["position"]), order))
-        
-        # Sort guides by order to ensure they're processed in waypoint sequence
-        for shape_id in guides_dict:
-            guides_dict[shape_id].sort(key=lambda x: x[3])  # Sort by order (4th element)
+        for shape_id, *guide in guides:
+            guides_dict.setdefault(shape_id, []).append(tuple(guide))
         
         return guides_dict
         
@@ -117,19 +147,27 @@ def load_straights_from_csv(straights_csv_path=None):
         Dict mapping shape_id to list of integers (waypoint indices)
     """
     if straights_csv_path is None:
-        straights_csv_path = Path(script_dir) / "straights.csv"
+        straights_csv_path = STRAIGHTS_CSV
     
     if not straights_csv_path.exists():
         return {}
     
+    return _read_straights_csv(straights_csv_path, straights_csv_path.stat().st_mtime_ns)
+
+
+@lru_cache(maxsize=None)
+def _read_straights_csv(straights_csv_path, mtime_ns):
+    """
+    Parse straights.csv, memoized on its path and modification time.
+    
+    The returned dict is shared between calls and must not be modified.
+    """
     try:
-        df = pd.read_csv(straights_csv_path)
-        straights_dict = {}
-        
-        # Group by shape_id and collect indices
-        for shape_id, group in df.groupby('shape_id'):
-            indices = group['index'].tolist()
-            straights_dict[shape_id] = indices
+        with open(straights_csv_path, newline="", encoding="utf-8") as f:
+            # Group by shape_id and collect indices
+            straights_dict = {}
+            for row in csv.DictReader(f):
+                straights_dict.setdefault(row["shape_id"], []).append(int(float(row["index"])))
         
         return straights_dict
         
@@ -151,6 +189,8 @@ def generate_brouter_urls_cli():
     - Plan new routes interactively
     - Export route geometries as GeoJSON files
     """
+    from src.gen_gtfs import STOPS, TRIPS
+
     nogos_dict = load_nogos_from_csv()
     guides_dict = load_guides_from_csv()
     straights_dict = load_straights_from_csv()
@@ -158,6 +198,99 @@ def generate_brouter_urls_cli():
         print(f"{route_id}: {url}")
 
 
+def _trip_rows(trip):
+    """
+    Build stop_times.txt rows for a single trip.
+
+    Args:
+        trip: Trip dictionary with a normalized stop_times list of
+              (arrival, stop_id, departure) tuples
+
+    Returns:
+        Iterator of (trip_id, arrival_time, departure_time, stop_id, stop_sequence) tuples
+    """
+    trip_id = trip["trip_id"]
+    # Times are formatted as HH:MM:00; stop_sequence is the order of stops on the trip
+    return (
+        (trip_id, arrival + ":00", departure + ":00", stop_id, i)
+        for i, (arrival, stop_id, departure) in enumerate(trip["stop_times"])
+    )
+
+
+def _shape_rows(shape_id, coords):
+    """
+    Build shapes.txt rows for a single shape.
+
+    Args:
+        shape_id: Shape identifier
+        coords: (N, 2) array of [longitude, latitude] points from the GeoJSON file
+
+    Returns:
+        Iterator of (shape_id, shape_pt_lat, shape_pt_lon, shape_pt_sequence) tuples
+    """
+    # Take the lon/lat columns as plain floats so csv writes them exactly as before
+    lons, lats = coords.T.tolist()
+    return zip(
+        repeat(shape_id),
+        lats,
+        lons,
+        range(1, len(lons) + 1),  # GTFS sequences start at 1, not 0
+    )
+
+
+def _load_shape_coords(shape_ids):
+    """
+    Load coordinates for a sequence of shapes from the shapes/ directory.
+
+    Args:
+        shape_ids: Shape identifiers, each matching a shapes/<shape_id>.geojson file
+
+    Returns:
+        Dict mapping shape_id to its (N, 2) array of [longitude, latitude] points,
+        in the order of shape_ids
+    """
+    # GeoJSON files are parsed concurrently by the batch loader
+    return dict(zip(shape_ids, linestrings_from_geojson_collection(
+        [SHAPES_DIR / f"{shape_id}.geojson" for shape_id in shape_ids]
+    )))
+
+
+def _write_table(f, rows, fieldnames=None):
+    """
+    Write GTFS table rows as CSV to an open text file.
+
+    Args:
+        f: Text file object opened with newline=""
+        rows: Iterable of record dicts, or of tuples already in column order
+        fieldnames: Column names; required for tuple rows. For dict rows they
+                    select which keys are written, and when omitted the header
+                    is the union of every record's keys
+    """
+    rows = iter(rows)
+    first = next(rows, None)  # Peek at the first row (tables may be generators)
+    if first is None:
+        # Empty table: write just the header when the columns are known
+        if fieldnames:
+            csv.writer(f, lineterminator="\n").writerow(fieldnames)
+        return
+    rows = chain((first,), rows)
+    if isinstance(first, dict):
+        if fieldnames:
+            # Explicit columns leave out record keys that aren't written (e.g. stop_times)
+            writer = csv.DictWriter(f, fieldnames=fieldnames, lineterminator="\n", extrasaction="ignore")
+        else:
+            # Union of keys in first-seen order, so a column present only on later
+            # records isn't dropped; records without it get an empty value
+            rows = list(rows)
+            fieldnames = list(dict.fromkeys(chain.from_iterable(rows)))
+            writer = csv.DictWriter(f, fieldnames=fieldnames, lineterminator="\n")
+        writer.writeheader()
+    else:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(fieldnames)
+    writer.writerows(rows)
+
+
 def generate_gtfs():
     """
     Generate complete GTFS feed as a zip archive.
@@ -178,96 +311,96 @@ def generate_gtfs():
     - feed_info.txt: Feed metadata
     - shapes.txt: Route geometries from GeoJSON files
     """
-    # Define GTFS file structure and data mappings
+    from src.gen_gtfs import (
+        AGENCY,
+        CALENDAR,
+        CALENDAR_DATES,
+        FEED_INFO,
+        ROUTES,
+        SHAPE_IDS,
+        STOPS,
+        TRIP_FIELDS,
+        TRIPS,
+    )
+
+    # Define GTFS file structure; each table's rows are generated only when
+    # that table is written
     FILES = {
-        "agency.txt": [AGENCY],
-        "stops.txt": STOPS,
-        "routes.txt": ROUTES,
-        "trips.txt": [
-            # Remove stop_times from trip data (goes in separate stop_times.txt file)
-            {k: v for k, v in trip.items() if k != "stop_times"} for trip in TRIPS
-        ],
-        "stop_times.txt": [
-            # Flatten nested list comprehension to create stop_times records
-            item
-            for sublist in [
-                [
-                    {
-                        "trip_id": trip["trip_id"],
-                        "arrival_time": f"{stop[0]}:00",  # Format time as HH:MM:00
-                        "departure_time": f"{stop[2] if len(stop) == 3 else stop[0]}:00",  # Use departure time if provided, else arrival
-                        "stop_id": stop[1],
-                        "stop_sequence": i,  # Sequential order of stops on trip
-                    }
-                    for i, stop in enumerate(trip["stop_times"])
-                ]
-                for trip in TRIPS
-            ]
-            for item in sublist
-        ],
-        "calendar.txt": CALENDAR,
-        "calendar_dates.txt": CALENDAR_DATES,
-        "feed_info.txt": [FEED_INFO],
-        "shapes.txt": [
-            # Generate shape points from GeoJSON files for route geometries
-            {
-                "shape_id": shape_id,
-                "shape_pt_lat": lat,
-                "shape_pt_lon": lon,
-                "shape_pt_sequence": seq,  # Sequential order of points along shape
-            }
-            # Get unique shape_ids from trips that have shapes defined
-            for shape_id in sorted({t["shape_id"] for t in TRIPS if "shape_id" in t})
-            # Load coordinates from corresponding GeoJSON file and enumerate with sequence numbers
-            for seq, (lon, lat, *_) in enumerate(
-                linestring_from_geojson(f"{script_dir}/shapes/{shape_id}.geojson"),
-                start=1,  # GTFS sequences start at 1, not 0
-            )
-        ],
+        # Shape points from the GeoJSON coordinates; every shape is loaded up
+        # front, then its rows are generated as they are written
+        "shapes.txt": lambda: chain.from_iterable(
+            _shape_rows(shape_id, coords) for shape_id, coords in _load_shape_coords(SHAPE_IDS).items()
+        ),
+        # Stream stop_times records one trip at a time instead of building a list
+        "stop_times.txt": lambda: chain.from_iterable(_trip_rows(trip) for trip in TRIPS),
+        "agency.txt": lambda: [AGENCY],
+        "stops.txt": lambda: STOPS,
+        "routes.txt": lambda: ROUTES,
+        # Trip dicts are written as-is; stop_times is left out by TRIP_FIELDS below
+        "trips.txt": lambda: TRIPS,
+        "calendar.txt": lambda: CALENDAR,
+        "calendar_dates.txt": lambda: CALENDAR_DATES,
+        "feed_info.txt": lambda: [FEED_INFO],
+    }
+    # Explicit columns for tables whose records carry keys that aren't written,
+    # or whose rows are plain tuples already in column order
+    FIELDNAMES = {
+        "trips.txt": TRIP_FIELDS,
+        "stop_times.txt": ("trip_id", "arrival_time", "departure_time", "stop_id", "stop_sequence"),
+        "shapes.txt": ("shape_id", "shape_pt_lat", "shape_pt_lon", "shape_pt_sequence"),
     }
 
-    # Create GTFS files in temporary directory, then zip them
-    with tempfile.TemporaryDirectory() as tmpdirname:
-        # Convert each data structure to CSV format
-        for filename, data in FILES.items():
-            pd.DataFrame(data).to_csv(Path(tmpdirname) / filename, index=False)
-        # Create zip archive containing all GTFS files
-        shutil.make_archive(str(feed_path), "zip", tmpdirname)
-        print(f"✅ GTFS archive created at: {feed_path}.zip")
+    # Stream each data structure as CSV straight into its zip entry (zlib level 1
+    # trades a little size for much faster compression)
+    with zipfile.ZipFile(f"{feed_path}.zip", "w", zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+        date_time = time.localtime()[:6]
+        for filename, build_table in FILES.items():
+            # Give entries a real timestamp and 0644 permissions, as make_archive
+            # did; a bare filename would get 1980-01-01 and 0600
+            zinfo = zipfile.ZipInfo(filename, date_time=date_time)
+            zinfo.external_attr = 0o644 << 16
+            zinfo.compress_type = zipfile.ZIP_DEFLATED
+            zinfo._compresslevel = zf.compresslevel  # open() doesn't apply the archive's level to a ZipInfo
+            with zf.open(zinfo, "w") as raw, io.TextIOWrapper(raw, encoding="utf-8", newline="") as f:
+                _write_table(f, build_table(), FIELDNAMES.get(filename))
+    print(f"✅ GTFS archive created at: {feed_path}.zip")
 
 
 def generate_stops():
     """
-    Generate stop definitions from CSV file and create Python code output.
+    Generate stop_ids for new stops in stops.csv.
     
     Reads stops.csv containing stop names and coordinates, generates unique
-    UUIDs for stops that don't have IDs, and outputs Python code for the
-    STOPS data structure. Also updates the CSV file with generated stop_ids.
+    UUIDs for stops that don't have IDs and writes the CSV back in place.
+    STOPS in src/gen_gtfs.py is loaded directly from this file.
     
-    The CSV file should contain columns: name, lat, lon, stop_id (optional)
+    The CSV file should contain columns: stop_name, stop_lat, stop_lon, stop_id (optional)
     Missing stop_ids are automatically generated as "STOP-{uuid4}"
     """
-    stops_csv = Path(script_dir) / "stops.csv"
-    df = pd.read_csv(stops_csv)
+    stops_csv = STOPS_CSV
+    with open(stops_csv, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        fieldnames = list(reader.fieldnames)
+        rows = list(reader)
 
     # Add stop_id column if it doesn't exist
-    if "stop_id" not in df.columns:
-        df["stop_id"] = ""
+    if "stop_id" not in fieldnames:
+        fieldnames.append("stop_id")
 
-    def make_id(existing_id):
-        """Generate stop ID if one doesn't exist, otherwise keep existing."""
-        return (
-            existing_id
-            if pd.notna(existing_id) and existing_id.strip()
-            else f"STOP-{uuid.uuid4()}"  # Generate unique UUID-based ID
-        )
-
-    # Apply ID generation to all stops
-    df["stop_id"] = df["stop_id"].apply(make_id)
+    # Generate unique UUID-based IDs only for the stops that are missing one
+    missing = [row for row in rows if not (row.get("stop_id") or "").strip()]
+    if not missing:
+        print(f"✅ All stops in {stops_csv} already have stop_ids, nothing to update")
+        return
+    for row in missing:
+        row["stop_id"] = f"STOP-{uuid.uuid4()}"
 
     # Save updated CSV with generated stop_ids
-    df.to_csv(stops_csv, index=False)
-    print(f"✅ Updated {stops_csv} with stop_ids")
+    with open(stops_csv, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, lineterminator="\n")
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"✅ Updated {stops_csv} with {len(missing)} new stop_ids")
 
 
 def update_stop_positions(brouter_url, trip_id):
@@ -278,13 +411,9 @@ def update_stop_positions(brouter_url, trip_id):
         brouter_url: Modified BRouter URL with new coordinates
         trip_id: ID of the trip to compare against
     """
-    stops_csv_path = Path(script_dir) / "stops.csv"
-    nogos_csv_path = Path(script_dir) / "nogos.csv"
-    guides_csv_path = Path(script_dir) / "guides.csv"
-    straights_csv_path = Path(script_dir) / "straights.csv"
-    nogos_dict = load_nogos_from_csv()
-    guides_dict = load_guides_from_csv()
-    result = update_stop_positions_from_url(brouter_url, trip_id, TRIPS, stops_csv_path, nogos_csv_path, guides_csv_path, straights_csv_path, nogos_dict, guides_dict)
+    from src.gen_gtfs import TRIPS
+
+    result = update_stop_positions_from_url(brouter_url, trip_id, TRIPS, STOPS_CSV, NOGOS_CSV, GUIDES_CSV, STRAIGHTS_CSV)
     
     if "error" in result:
         print(f"❌ Error: {result['error']}")
@@ -320,14 +449,14 @@ def update_stop_positions(brouter_url, trip_id):
         print(f"📊 Summary: {result['stops_moved']}/{result['total_stops']} stops updated")
         print(f"   Average distance: {result['avg_distance_m']:.1f}m")
         print(f"   Total distance: {result['total_distance_m']:.1f}m")
-        print(f"✅ Updated {stops_csv_path}")
+        print(f"✅ Updated {STOPS_CSV}")
     else:
         print("✅ No stops were significantly moved")
     
     # Handle nogos information
     nogos_info = result.get('nogos_info', {})
     if nogos_info.get('nogos_csv_created'):
-        print(f"📄 Created {nogos_csv_path}")
+        print(f"📄 Created {NOGOS_CSV}")
     
     if nogos_info.get('nogos_updated'):
         shape_id = nogos_info['shape_id']
@@ -335,7 +464,7 @@ def update_stop_positions(brouter_url, trip_id):
         print(f"🚫 Updated {nogos_count} nogos for shape '{shape_id}':")
         for i, (lon, lat, radius) in enumerate(nogos_info['nogos'], 1):
             print(f"   {i}. {lat:.6f}, {lon:.6f} (radius: {radius}m)")
-        print(f"✅ Updated {nogos_csv_path}")
+        print(f"✅ Updated {NOGOS_CSV}")
     elif nogos_info.get('nogos_error'):
         print(f"⚠️  Nogos warning: {nogos_info['nogos_error']}")
     elif 'nogos_info' in result:
@@ -344,7 +473,7 @@ def update_stop_positions(brouter_url, trip_id):
     # Handle guide points information
     guides_info = result.get('guides_info', {})
     if guides_info.get('guides_csv_created'):
-        print(f"📄 Created {guides_csv_path}")
+        print(f"📄 Created {GUIDES_CSV}")
     
     if guides_info.get('guides_updated'):
         shape_id = guides_info['shape_id']
@@ -352,7 +481,7 @@ def update_stop_positions(brouter_url, trip_id):
         print(f"🧭 Updated {guides_count} guide points for shape '{shape_id}':")
         for i, (lon, lat, position) in enumerate(guides_info['guides'], 1):
             print(f"   {i}. {lat:.6f}, {lon:.6f} (position: {position})")
-        print(f"✅ Updated {guides_csv_path}")
+        print(f"✅ Updated {GUIDES_CSV}")
     elif guides_info.get('guides_error'):
         print(f"⚠️  Guides warning: {guides_info['guides_error']}")
     elif 'guides_info' in result:
@@ -361,14 +490,14 @@ def update_stop_positions(brouter_url, trip_id):
     # Handle straight line segments information
     straights_info = result.get('straights_info', {})
     if straights_info.get('straights_csv_created'):
-        print(f"📄 Created {straights_csv_path}")
+        print(f"📄 Created {STRAIGHTS_CSV}")
     
     if straights_info.get('straights_updated'):
         shape_id = straights_info['shape_id']
         indices = straights_info['indices']
         indices_str = ','.join(map(str, indices))
         print(f"📏 Updated straight line segments for shape '{shape_id}': [{indices_str}]")
-        print(f"✅ Updated {straights_csv_path}")
+        print(f"✅ Updated {STRAIGHTS_CSV}")
     elif straights_info.get('straights_error'):
         print(f"⚠️  Straights warning: {straights_info['straights_error']}")
     elif 'straights_info' in result:
@@ -385,12 +514,15 @@ if __name__ == "__main__":
 
     # Generate GTFS zip file
     gtfs_parser = subparsers.add_parser("gen-gtfs", help="Generate GTFS zip")
+    gtfs_parser.set_defaults(func=lambda args: generate_gtfs())
 
-    # Generate stops Python code and update stops.csv
-    stops_parser = subparsers.add_parser("gen-stops", help="Generate stops Python code and update stops.csv")
+    # Generate missing stop_ids in stops.csv
+    stops_parser = subparsers.add_parser("gen-stops", help="Generate missing stop_ids in stops.csv")
+    stops_parser.set_defaults(func=lambda args: generate_stops())
 
     # Generate BRouter URLs for trips
     brouter_parser = subparsers.add_parser("gen-brouter-urls", help="Generate BRouter URLs for trips")
+    brouter_parser.set_defaults(func=lambda args: generate_brouter_urls_cli())
 
     # Update stop positions from modified BRouter URL
     update_parser = subparsers.add_parser("update-stop-positions", help="Update stop positions from modified BRouter URL")
@@ -406,18 +538,16 @@ if __name__ == "__main__":
         required=True,
         help="Trip ID to compare against",
     )
+    update_parser.set_defaults(func=lambda args: update_stop_positions(args.brouter_url, args.trip_id))
 
     args = parser.parse_args()
 
-    # Execute the requested command
-    if args.command == "gen-gtfs":
-        generate_gtfs()
-    elif args.command == "gen-stops":
-        generate_stops()
-    elif args.command == "gen-brouter-urls":
-        generate_brouter_urls_cli()
-    elif args.command == "update-stop-positions":
-        update_stop_positions(args.brouter_url, args.trip_id)
+    # Library warnings (e.g. unknown stop_ids) go to stderr as plain messages
+    logging.basicConfig(format="%(message)s", level=logging.WARNING)
+
+    # Execute the requested command via the handler its subparser registered
+    if hasattr(args, "func"):
+        args.func(args)
     else:
         # No command specified, show help
         parser.print_help()
@@ -6,8 +6,96 @@ This module provides functions for working with BRouter URLs for route planning
 and visualization, including extracting coordinates and comparing stop locations.
 """
 
+import csv
+import logging
+import re
+import warnings
+from functools import lru_cache
+from itertools import chain
+from operator import itemgetter
 from urllib.parse import urlparse, parse_qs
-from geopy.distance import geodesic
+
+from src.gtfs_lib import haversine_m
+
+logger = logging.getLogger(__name__)
+
+# One "key=value" parameter of a URL fragment; the value runs to the next '&'
+_FRAGMENT_PARAM_RE = re.compile(r'([^&=]*)=([^&]*)')
+
+# Well-formed ';'-separated groups of exactly 2 or 3 ','-separated fields
+_NUMBER_GROUPS_RE = {
+    2: re.compile(r'[^,;]+,[^,;]+(?:;[^,;]+,[^,;]+)*'),
+    3: re.compile(r'[^,;]+,[^,;]+,[^,;]+(?:;[^,;]+,[^,;]+,[^,;]+)*'),
+}
+
+
+def _parse_number_groups(value, width):
+    """
+    Parse ';'-separated groups of ','-separated numbers in one vectorized call.
+    
+    Args:
+        value: Parameter value such as "lon,lat;lon,lat"
+        width: Number of fields in every group
+        
+    Returns:
+        NumPy float array of shape (N, width), or None if any group is malformed or
+        non-finite so the caller can fall back to parsing group by group
+    """
+    import numpy as np
+
+    if not _NUMBER_GROUPS_RE[width].fullmatch(value):
+        return None
+    try:
+        # Older NumPy warns and returns a truncated array instead of raising
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', DeprecationWarning)
+            numbers = np.fromstring(value.replace(';', ','), sep=',')
+    except (ValueError, DeprecationWarning):
+        return None
+    # nan/inf parse as floats but aren't valid values; leave them to the fallback
+    if numbers.size != (value.count(';') + 1) * width or not np.isfinite(numbers).all():
+        return None
+    return numbers.reshape(-1, width)
+
+
+def _split_groups(value, width):
+    """
+    Split ';'-separated groups into their ','-separated fields in one pass each.
+    
+    Args:
+        value: Parameter value such as "lon,lat,radius;lon,lat,radius"
+        width: Number of fields to split each group into; the last field keeps
+            any further commas
+        
+    Returns:
+        Generator yielding a list of `width` field strings per group, skipping
+        groups with fewer fields
+    """
+    for group in value.split(';'):
+        fields = group.split(',', width - 1)
+        if len(fields) == width:
+            yield fields
+
+
+@lru_cache(maxsize=128)
+def _brouter_params(url):
+    """
+    Split a BRouter URL into its parameters, parsed once per distinct URL.
+    
+    Args:
+        url: BRouter URL with parameters in the hash fragment or the query string
+        
+    Returns:
+        Dict mapping parameter names to their string values. Fragment
+        parameters keep the last occurrence of a repeated key, query parameters the
+        first. The dict is shared between callers and must not be modified.
+    """
+    fragment = url.partition('#')[2]
+    # Handle fragment-based URLs (BRouter uses hash fragments)
+    if fragment:
+        return dict(_FRAGMENT_PARAM_RE.findall(fragment))
+    # Handle query-based URLs
+    return {key: values[0] for key, values in parse_qs(urlparse(url).query).items()}
 
 
 def extract_nogos_from_brouter_url(url):
@@ -21,44 +109,27 @@ def extract_nogos_from_brouter_url(url):
         List of (longitude, latitude, radius) tuples, or empty list if parsing fails
     """
     try:
-        # Parse the URL into components
-        parsed = urlparse(url)
-        
-        # Handle fragment-based URLs (BRouter uses hash fragments)
-        if parsed.fragment:
-            # Extract query parameters from the fragment
-            fragment_parts = parsed.fragment.split('&')
-            query_params = {}
-            for part in fragment_parts:
-                if '=' in part:
-                    key, value = part.split('=', 1)
-                    query_params[key] = value
-            
-            nogos_value = query_params.get('nogos')
-        else:
-            # Handle query-based URLs
-            query_params = parse_qs(parsed.query)
-            nogos_list = query_params.get('nogos', [])
-            nogos_value = nogos_list[0] if nogos_list else None
+        nogos_value = _brouter_params(url).get('nogos')
         
         if not nogos_value:
             return []
         
-        # Parse nogos triplets
-        nogo_triplets = nogos_value.split(';')
+        # Parse all nogos triplets at once when they are well-formed
+        parsed_nogos = _parse_number_groups(nogos_value, 3)
+        if parsed_nogos is not None:
+            lons, lats, radii = parsed_nogos.T
+            return list(zip(lons.tolist(), lats.tolist(), radii.astype(int).tolist()))
+        
+        # Otherwise parse triplet by triplet, skipping invalid ones
         nogos = []
         
-        for triplet in nogo_triplets:
-            if triplet.count(',') == 2:
-                try:
-                    lon_str, lat_str, radius_str = triplet.split(',')
-                    lon = float(lon_str)
-                    lat = float(lat_str)
-                    radius = int(float(radius_str))
-                    nogos.append((lon, lat, radius))
-                except ValueError:
-                    # Skip invalid nogos triplets
-                    continue
+        for lon_str, lat_str, radius_str in _split_groups(nogos_value, 3):
+            try:
+                nogos.append((float(lon_str), float(lat_str), int(float(radius_str))))
+            except (ValueError, OverflowError):
+                # Skip invalid nogos triplets (including ones with extra fields or a
+                # nan/inf radius)
+                continue
         
         return nogos
         
@@ -78,45 +149,21 @@ def extract_pois_from_brouter_url(url):
         List of (longitude, latitude, label) tuples, or empty list if parsing fails
     """
     try:
-        # Parse the URL into components
-        parsed = urlparse(url)
-        
-        # Handle fragment-based URLs (BRouter uses hash fragments)
-        if parsed.fragment:
-            # Extract query parameters from the fragment
-            fragment_parts = parsed.fragment.split('&')
-            query_params = {}
-            for part in fragment_parts:
-                if '=' in part:
-                    key, value = part.split('=', 1)
-                    query_params[key] = value
-            
-            pois_value = query_params.get('pois')
-        else:
-            # Handle query-based URLs
-            query_params = parse_qs(parsed.query)
-            pois_list = query_params.get('pois', [])
-            pois_value = pois_list[0] if pois_list else None
+        pois_value = _brouter_params(url).get('pois')
         
         if not pois_value:
             return []
         
         # Parse POI triplets
-        poi_triplets = pois_value.split(';')
         pois = []
         
-        for triplet in poi_triplets:
-            if triplet.count(',') >= 2:
-                try:
-                    parts = triplet.split(',')
-                    lon = float(parts[0])
-                    lat = float(parts[1])
-                    # Label is everything after the second comma
-                    label = ','.join(parts[2:]) if len(parts) > 2 else ""
-                    pois.append((lon, lat, label))
-                except ValueError:
-                    # Skip invalid POI triplets
-                    continue
+        # Label is everything after the second comma
+        for lon_str, lat_str, label in _split_groups(pois_value, 3):
+            try:
+                pois.append((float(lon_str), float(lat_str), label))
+            except ValueError:
+                # Skip invalid POI triplets
+                continue
         
         return pois
         
@@ -136,25 +183,7 @@ def extract_straight_from_brouter_url(url):
         List of integers representing waypoint indices that should be straight lines, or empty list if parsing fails
     """
     try:
-        # Parse the URL into components
-        parsed = urlparse(url)
-        
-        # Handle fragment-based URLs (BRouter uses hash fragments)
-        if parsed.fragment:
-            # Extract query parameters from the fragment
-            fragment_parts = parsed.fragment.split('&')
-            query_params = {}
-            for part in fragment_parts:
-                if '=' in part:
-                    key, value = part.split('=', 1)
-                    query_params[key] = value
-            
-            straight_value = query_params.get('straight')
-        else:
-            # Handle query-based URLs
-            query_params = parse_qs(parsed.query)
-            straight_list = query_params.get('straight', [])
-            straight_value = straight_list[0] if straight_list else None
+        straight_value = _brouter_params(url).get('straight')
         
         if not straight_value:
             return []
@@ -184,55 +213,40 @@ def extract_coords_from_brouter_url(url):
         url: BRouter URL containing lonlats parameter
         
     Returns:
-        List of (longitude, latitude) tuples, or empty list if parsing fails
+        NumPy float array of shape (N, 2) holding (longitude, latitude) rows, or
+        an empty (0, 2) array if parsing fails
     """
+    import numpy as np
+
     try:
-        # Parse the URL into components
-        parsed = urlparse(url)
-        
-        # Handle fragment-based URLs (BRouter uses hash fragments)
-        if parsed.fragment:
-            # Extract query parameters from the fragment
-            fragment_parts = parsed.fragment.split('&')
-            query_params = {}
-            for part in fragment_parts:
-                if '=' in part:
-                    key, value = part.split('=', 1)
-                    query_params[key] = value
-            
-            lonlats_value = query_params.get('lonlats')
-        else:
-            # Handle query-based URLs
-            query_params = parse_qs(parsed.query)
-            lonlats_list = query_params.get('lonlats', [])
-            lonlats_value = lonlats_list[0] if lonlats_list else None
+        lonlats_value = _brouter_params(url).get('lonlats')
         
         if not lonlats_value:
-            return []
+            return np.empty((0, 2))
         
-        # Parse coordinate pairs
-        coord_pairs = lonlats_value.split(';')
+        # Parse all coordinate pairs at once when they are well-formed
+        parsed_coords = _parse_number_groups(lonlats_value, 2)
+        if parsed_coords is not None:
+            return parsed_coords
+        
+        # Otherwise parse pair by pair, skipping invalid ones
         coords = []
         
-        for pair in coord_pairs:
-            if ',' in pair:
-                try:
-                    lon_str, lat_str = pair.split(',', 1)
-                    lon = float(lon_str)
-                    lat = float(lat_str)
-                    coords.append((lon, lat))
-                except ValueError:
-                    # Skip invalid coordinate pairs
-                    continue
+        for lon_str, lat_str in _split_groups(lonlats_value, 2):
+            try:
+                coords.append((float(lon_str), float(lat_str)))
+            except ValueError:
+                # Skip invalid coordinate pairs
+                continue
         
-        return coords
+        return np.array(coords, dtype=float).reshape(-1, 2)
         
     except Exception:
-        # Return empty list if any parsing fails
-        return []
+        # Return empty array if any parsing fails
+        return np.empty((0, 2))
 
 
-def generate_brouter_urls(trips, stops, nogos=None, guides=None, straights=None):
+def generate_brouter_urls(trips, stops, nogos=None, guides=None, straights=None, dedupe_by_shape=True):
     """
     Generate BRouter URLs for route planning and visualization.
     
@@ -240,103 +254,169 @@ def generate_brouter_urls(trips, stops, nogos=None, guides=None, straights=None)
         trips: List of trip dictionaries with stop_times
         stops: List of stop dictionaries with coordinates
         nogos: Dict mapping shape_id to list of (lon, lat, radius) tuples for no-go areas
-        guides: Dict mapping shape_id to list of (lon, lat, position) tuples for guide points
+        guides: Dict mapping shape_id to list of (lon, lat, position, order) tuples for guide
+            points, already sorted by order as load_guides_from_csv returns them (legacy
+            (lon, lat, position) tuples are sorted by position)
         straights: Dict mapping shape_id to list of waypoint indices for straight line segments
+        dedupe_by_shape: Build a single URL per shape_id from its first trip; trips
+            without a shape_id are deduplicated by their stop coordinates. Set to
+            False if trips sharing a shape_id may have different stop sequences, in
+            which case every trip is deduplicated by shape_id and stop coordinates
         
     Returns:
         Generator yielding (shape_id/trip_id, url) tuples
     """
-    # Create lookup dictionary mapping stop IDs to coordinates
-    stop_lookup = {s["stop_id"]: (s["stop_lon"], s["stop_lat"]) for s in stops}
+    # Lookup dictionary mapping stop IDs to preformatted "lon,lat" strings
+    stop_lookup = {s["stop_id"]: f"{s['stop_lon']},{s['stop_lat']}" for s in stops}
 
     # BRouter web interface URL components
     base = "https://brouter.de/brouter-web/#map=11/42.4655/-73.6002/standard&lonlats="
     suffix = "&profile=car-fast"
 
-    # Track seen URLs to avoid duplicates for trips with same shape
+    # Format each shape's nogos and straight parameters once rather than once per trip
+    nogos_params = {
+        shape_id: "&nogos=" + ";".join(f"{lon},{lat},{radius}" for lon, lat, radius in shape_nogos)
+        for shape_id, shape_nogos in (nogos or {}).items()
+        if shape_id and shape_nogos
+    }
+    straight_params = {
+        shape_id: "&straight=" + ",".join(map(str, straight_indices))
+        for shape_id, straight_indices in (straights or {}).items()
+        if shape_id and straight_indices
+    }
+    
+    # Order each shape's guide points once, as (position, "lon,lat") pairs
+    guide_points = {}
+    for shape_id, guide_list in (guides or {}).items():
+        if not (shape_id and guide_list):
+            continue
+        # Handle both old 3-tuple and new 4-tuple formats
+        if len(guide_list[0]) == 4:
+            # New format with order: (lon, lat, position, order) - already in waypoint sequence
+            guide_tuples = [(lon, lat, position) for lon, lat, position, order in guide_list]
+        else:
+            # Old format: (lon, lat, position) - sort by position
+            guide_tuples = sorted(guide_list, key=itemgetter(2))
+        # Reversed so guides are inserted from end to beginning, keeping indices correct
+        guide_points[shape_id] = [(position, f"{lon},{lat}") for lon, lat, position in reversed(guide_tuples)]
+
+    # Track seen (shape_id, stop coordinates) keys to avoid duplicate URLs
     seen = set()
 
-    # Process each trip to generate route URLs
-    for trip in trips:
-        stop_times = trip["stop_times"]
-        if not stop_times:
-            continue
+    trips = [trip for trip in trips if trip["stop_times"]]
 
-        # Sort stop_times by arrival time to ensure proper sequence
-        sorted_stop_times = sorted(stop_times, key=lambda x: x[0])
+    # Report unknown stop_ids once, up front, so the coordinate loop has no I/O;
+    # the message is only formatted if warnings are enabled for this logger
+    unknown = {stop_id for trip in trips for _, stop_id, _ in trip["stop_times"]} - stop_lookup.keys()
+    if unknown and logger.isEnabledFor(logging.WARNING):
+        logger.warning("⚠️ Unknown stop_ids: %s", ", ".join(sorted(unknown)))
 
-        # Build coordinate list from stop sequence
-        coords = []
-        for time_str, stop_id in sorted_stop_times:
-            if stop_id in stop_lookup:
-                coords.append(stop_lookup[stop_id])
-            else:
-                print(f"⚠️ Unknown stop_id: {stop_id}")
+    if dedupe_by_shape:
+        # Keep only the first trip for each shape; trips without a shape_id are all
+        # kept and deduplicated by their stop coordinates below
+        seen_shapes = set()
+        deduped = []
+        for trip in trips:
+            shape_id = trip.get("shape_id")
+            if shape_id:
+                if shape_id in seen_shapes:
+                    continue
+                seen_shapes.add(shape_id)
+            deduped.append(trip)
+        trips = deduped
+
+    # Sort each trip's stop_times by arrival time once, up front
+    sorted_trips = [(trip, sorted(trip["stop_times"], key=itemgetter(0))) for trip in trips]
+
+    # Process each trip to generate route URLs
+    for trip, sorted_stop_times in sorted_trips:
+        # Build "lon,lat" coordinate list from stop sequence, hashing each stop_id once;
+        # unknown stops (already reported) come back as None and are dropped
+        coords = [coord for coord in map(stop_lookup.get, map(itemgetter(1), sorted_stop_times)) if coord is not None]
 
         if not coords:
             continue
 
-        # Insert guide points at specified positions
         shape_id = trip.get("shape_id")
+        if not (dedupe_by_shape and shape_id):
+            # Everything added below is determined by shape_id and the stop coordinates,
+            # so key on those and skip repeats before any URL parts are built. The
+            # coordinate strings are shared stop_lookup values with cached hashes, so a
+            # tuple of them hashes without joining a new string per trip
+            key = (shape_id, tuple(coords))
+            if key in seen:
+                continue
+            seen.add(key)
+
+        # Insert guide points at specified positions; each "lon,lat" string is
+        # reused for the pois parameter
         guide_pois = []
-        if guides and shape_id and shape_id in guides:
-            # Handle both old 3-tuple and new 4-tuple formats
-            guide_list = guides[shape_id]
-            if guide_list and len(guide_list[0]) == 4:
-                # New format with order: (lon, lat, position, order) - sort by order for waypoint sequence
-                sorted_guides = sorted(guide_list, key=lambda x: x[3])
-                guide_tuples = [(lon, lat, position) for lon, lat, position, order in sorted_guides]
-            else:
-                # Old format: (lon, lat, position) - sort by position
-                guide_tuples = sorted(guide_list, key=lambda x: x[2])
-            
-            # Insert guides from end to beginning to maintain correct indices
-            for lon, lat, position in reversed(guide_tuples):
-                if 0 <= position <= len(coords):
-                    coords.insert(position, (lon, lat))
-                    guide_pois.append((lon, lat, "GUIDE"))
+        for position, point in guide_points.get(shape_id, ()):
+            if 0 <= position <= len(coords):
+                coords.insert(position, point)
+                guide_pois.append(point)
 
-        # Format coordinates for BRouter URL (longitude,latitude pairs separated by semicolons)
-        lonlats = ";".join(f"{lon},{lat}" for lon, lat in coords)
+        # Collect URL parts and join them once at the end; coordinates are
+        # longitude,latitude pairs separated by semicolons
+        parts = [base, ";".join(coords), suffix]
         
         # Add nogos parameter if specified for this shape_id
-        nogos_param = ""
-        if nogos and shape_id and shape_id in nogos:
-            nogos_list = []
-            for lon, lat, radius in nogos[shape_id]:
-                nogos_list.append(f"{lon},{lat},{radius}")
-            if nogos_list:
-                nogos_param = f"&nogos={';'.join(nogos_list)}"
-        
-        # Add POIs parameter for guide points
-        pois_param = ""
+        if shape_id in nogos_params:
+            parts.append(nogos_params[shape_id])
+        
+        # Add POIs parameter for guide points, labelling them in a single join
+        # instead of formatting each "lon,lat,GUIDE" separately
         if guide_pois:
-            poi_list = []
-            for lon, lat, label in guide_pois:
-                poi_list.append(f"{lon},{lat},{label}")
-            if poi_list:
-                pois_param = f"&pois={';'.join(poi_list)}"
+            parts += ("&pois=", ",GUIDE;".join(guide_pois), ",GUIDE")
         
         # Add straight parameter if specified for this shape_id
-        straight_param = ""
-        if straights and shape_id and shape_id in straights:
-            straight_indices = straights[shape_id]
-            if straight_indices:
-                straight_param = f"&straight={','.join(map(str, straight_indices))}"
+        if shape_id in straight_params:
+            parts.append(straight_params[shape_id])
         
-        url = f"{base}{lonlats}{suffix}{nogos_param}{pois_param}{straight_param}"
-
-        # Use shape_id and URL as key to avoid duplicate URLs for same route shape
-        key = (trip.get("shape_id"), url)
-        if key in seen:
-            continue
-        seen.add(key)
+        url = "".join(parts)
 
         # Output the route identifier and corresponding BRouter URL
         yield (trip.get('shape_id') or trip['trip_id'], url)
 
 
-def update_stop_positions_from_url(brouter_url, trip_id, trips, stops_csv_path, nogos_csv_path=None, guides_csv_path=None, straights_csv_path=None, nogos=None, guides=None):
+def _replace_shape_rows(csv_path, fieldnames, shape_id, new_rows):
+    """
+    Replace one shape's rows in a per-shape CSV such as nogos.csv.
+    
+    Rows for other shapes are kept exactly as read, and the file is rewritten
+    once; no DataFrame is built or concatenated.
+    
+    Args:
+        csv_path: Path to the CSV file; created with `fieldnames` if it doesn't exist
+        fieldnames: Column names to use when the file is created; an existing
+            file keeps its own header, extended with any new_rows keys it lacks
+        shape_id: Shape whose existing rows are replaced
+        new_rows: List of row dictionaries to add for shape_id
+        
+    Returns:
+        True if the file was created, False if it already existed
+    """
+    created = not csv_path.exists()
+    rows = []
+    if not created:
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            fieldnames = reader.fieldnames or fieldnames
+            rows = [row for row in reader if row["shape_id"] != shape_id]
+    
+    # Add any columns the new rows carry that an older file lacks (e.g. guides'
+    # order); existing rows are left empty in them
+    fieldnames = list(dict.fromkeys(chain(fieldnames, *new_rows)))
+    
+    rows.extend(new_rows)
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, lineterminator="\n")
+        writer.writeheader()
+        writer.writerows(rows)
+    return created
+
+
+def update_stop_positions_from_url(brouter_url, trip_id, trips, stops_csv_path, nogos_csv_path=None, guides_csv_path=None, straights_csv_path=None):
     """
     Update stop positions in stops.csv from a modified BRouter URL.
     Also extracts nogos, guide points, and straight line indices from the URL and saves them to respective CSV files if paths provided.
@@ -349,18 +429,22 @@ def update_stop_positions_from_url(brouter_url, trip_id, trips, stops_csv_path,
         nogos_csv_path: Path to nogos.csv file (optional)
         guides_csv_path: Path to guides.csv file (optional)
         straights_csv_path: Path to straights.csv file (optional)
-        nogos: Dict mapping shape_id to list of (lon, lat, radius) tuples for no-go areas
-        guides: Dict mapping shape_id to list of (lon, lat, position) tuples for guide points
         
     Returns:
         Dict with update results or error information
     """
+    # numpy and pandas stay function-local so URL generation doesn't pay their import cost
+    import numpy as np
     import pandas as pd
-    from geopy.distance import geodesic
-    from urllib.parse import urlparse
     
     # Validate URL format
     try:
+        # Reject obvious misses with substring tests before urlparse builds a ParseResult
+        if not brouter_url or "//" not in brouter_url:
+            return {"error": "Invalid URL format - missing scheme or domain"}
+        if 'brouter' not in brouter_url.lower():
+            return {"error": "URL does not appear to be a BRouter URL"}
+        
         parsed = urlparse(brouter_url)
         if not parsed.scheme or not parsed.netloc:
             return {"error": "Invalid URL format - missing scheme or domain"}
@@ -371,7 +455,7 @@ def update_stop_positions_from_url(brouter_url, trip_id, trips, stops_csv_path,
     
     # Extract coordinates from URL
     new_coords = extract_coords_from_brouter_url(brouter_url)
-    if not new_coords:
+    if not len(new_coords):
         return {"error": "Could not extract coordinates from BRouter URL - check that the URL contains a 'lonlats' parameter"}
     
     # Extract straight line indices from URL
@@ -391,8 +475,13 @@ def update_stop_positions_from_url(brouter_url, trip_id, trips, stops_csv_path,
     print(f"   Straight line indices: {straight_indices}")
     print(f"   No-go areas: {len(nogos_from_url)}")
     
+    # Plain-float rows for the per-coordinate loops below, and contiguous
+    # per-axis arrays (structure of arrays) for the vectorized distance passes
+    coord_list = new_coords.tolist()
+    coord_lon, coord_lat = np.ascontiguousarray(new_coords.T)
+    
     print(f"\n📊 Coordinates breakdown:")
-    for i, (lon, lat) in enumerate(new_coords):
+    for i, (lon, lat) in enumerate(coord_list):
         coord_type = "COORDINATE"
         if any(abs(lon - g_lon) < 0.0001 and abs(lat - g_lat) < 0.0001 for g_lon, g_lat in guide_pois):
             coord_type = "GUIDE"
@@ -405,15 +494,19 @@ def update_stop_positions_from_url(brouter_url, trip_id, trips, stops_csv_path,
         for lon, lat, radius in nogos_from_url:
             print(f"   {lon:9.6f}, {lat:8.6f} - radius {radius}m")
     
-    # Find the trip
+    # Find the trip; a single scan that stops at the first match is cheaper
+    # than indexing every trip for one lookup
     trip = next((t for t in trips if t['trip_id'] == trip_id), None)
     if not trip:
         available_trips = [t['trip_id'] for t in trips]
         return {"error": f"Trip '{trip_id}' not found. Available trips: {', '.join(available_trips)}"}
     
-    # Load stops.csv
+    # Load stops.csv with explicit dtypes so pandas skips type inference
     try:
-        df = pd.read_csv(stops_csv_path)
+        df = pd.read_csv(
+            stops_csv_path,
+            dtype={'stop_id': str, 'stop_name': str, 'stop_lat': float, 'stop_lon': float},
+        )
     except FileNotFoundError:
         return {"error": f"stops.csv file not found at path: {stops_csv_path}"}
     except Exception as e:
@@ -426,60 +519,63 @@ def update_stop_positions_from_url(brouter_url, trip_id, trips, stops_csv_path,
         return {"error": f"stops.csv missing required columns: {', '.join(missing_columns)}"}
     
     # Get original stop sequence
-    sorted_stop_times = sorted(trip["stop_times"], key=lambda x: x[0])
+    sorted_stop_times = sorted(trip["stop_times"], key=itemgetter(0))
     
     print(f"\n🚌 Trip '{trip_id}' has {len(sorted_stop_times)} stops:")
-    for i, (time_str, stop_id) in enumerate(sorted_stop_times):
+    for i, (time_str, stop_id, _) in enumerate(sorted_stop_times):
         print(f"   {i:2d}: {stop_id} at {time_str}")
     
     # Filter out guide points from coordinates by finding closest matches to GUIDE POIs
-    stop_coords = []
     detected_guides = []
     guide_indices = set()
-    available_coords = set(range(len(new_coords)))  # Track which coordinates are still available
+    taken = np.zeros(len(new_coords), dtype=bool)  # Track which coordinates are no longer available
+    
+    # Measure every GUIDE POI against every coordinate in one broadcast call:
+    # row g of the (G, N) matrix holds guide g's distance to each coordinate
+    guide_matrix = np.array(guide_pois, dtype=float).reshape(-1, 2)
+    all_guide_distances = haversine_m(
+        coord_lat, coord_lon, guide_matrix[:, 1:2], guide_matrix[:, 0:1],
+    )
     
     # For each GUIDE POI, find the closest available coordinate (one-to-one mapping)
-    for guide_lon, guide_lat in guide_pois:
-        closest_distance = float('inf')
-        closest_index = -1
-        
-        # Find the closest available coordinate
-        for i in available_coords:
-            lon, lat = new_coords[i]
-            distance_m = geodesic((lat, lon), (guide_lat, guide_lon)).meters
-            if distance_m < closest_distance:
-                closest_distance = distance_m
-                closest_index = i
+    for (guide_lon, guide_lat), guide_distances in zip(guide_pois, all_guide_distances):
+        # Rule out coordinates already matched to an earlier guide
+        guide_distances[taken] = np.inf
+        closest_index = int(np.argmin(guide_distances))
+        if np.isinf(guide_distances[closest_index]):
+            closest_index = -1  # Every coordinate is already taken
         
         # Always match to the closest available coordinate
         if closest_index >= 0:
+            closest_distance = float(guide_distances[closest_index])
             # Add warning if guide is more than 5 meters away from matched coordinate
             if closest_distance > 5.0:
                 print(f"⚠️  Warning: GUIDE POI at ({guide_lat:.6f}, {guide_lon:.6f}) is {closest_distance:.1f}m away from closest coordinate")
             
             guide_indices.add(closest_index)
-            available_coords.remove(closest_index)  # Mark coordinate as taken
-            lon, lat = new_coords[closest_index]
+            taken[closest_index] = True  # Mark coordinate as taken
+            lon, lat = coord_list[closest_index]
             detected_guides.append((lon, lat, closest_index))
         else:
             # This should never happen if we have the right number of coordinates
             print(f"⚠️ Warning: GUIDE POI at {guide_lon}, {guide_lat} could not be matched to any available coordinate")
     
-    # Build stop_coords excluding guide indices
-    for i, (lon, lat) in enumerate(new_coords):
-        if i not in guide_indices:
-            stop_coords.append((lon, lat))
+    # Build the stop coordinates excluding guide indices
+    is_stop = np.ones(len(new_coords), dtype=bool)
+    is_stop[list(guide_indices)] = False
+    new_lon = coord_lon[is_stop]
+    new_lat = coord_lat[is_stop]
     
     # Validate lengths match after removing guides
-    if len(stop_coords) != len(sorted_stop_times):
+    if len(new_lon) != len(sorted_stop_times):
         print(f"\n❌ Coordinate count mismatch:")
         print(f"   URL has {len(new_coords)} total coordinates")
         print(f"   Found {len(guide_pois)} GUIDE POIs in URL")
         print(f"   Detected {len(detected_guides)} GUIDE point matches")
         print(f"   Unique guide coordinate indices: {len(guide_indices)}")
-        print(f"   Remaining coordinates after removing guides: {len(stop_coords)}")
+        print(f"   Remaining coordinates after removing guides: {len(new_lon)}")
         print(f"   Trip '{trip_id}' expects {len(sorted_stop_times)} stops")
-        print(f"   Mismatch: {len(stop_coords)} coordinates vs {len(sorted_stop_times)} expected stops")
+        print(f"   Mismatch: {len(new_lon)} coordinates vs {len(sorted_stop_times)} expected stops")
         
         # Show which guide indices have multiple POIs
         from collections import Counter
@@ -489,98 +585,105 @@ def update_stop_positions_from_url(brouter_url, trip_id, trips, stops_csv_path,
             print(f"   Multiple GUIDE POIs mapped to same coordinates: {duplicates}")
         
         return {
-            "error": f"Coordinate count mismatch: {len(stop_coords)} coordinates remaining after removing {len(guide_indices)} unique guide coordinates (from {len(detected_guides)} guide matches), but trip expects {len(sorted_stop_times)} stops",
+            "error": f"Coordinate count mismatch: {len(new_lon)} coordinates remaining after removing {len(guide_indices)} unique guide coordinates (from {len(detected_guides)} guide matches), but trip expects {len(sorted_stop_times)} stops",
             "url_total_coords": len(new_coords),
             "detected_guides": len(detected_guides),
-            "remaining_coords": len(stop_coords),
+            "remaining_coords": len(new_lon),
             "expected_stops": len(sorted_stop_times),
-            "difference": len(stop_coords) - len(sorted_stop_times)
+            "difference": len(new_lon) - len(sorted_stop_times)
         }
     
     # Compare and update coordinates
-    updates = []
-    total_moved = 0
-    total_distance = 0.0
+    stop_ids = [stop_id for _, stop_id, _ in sorted_stop_times]
     
-    for i, (new_lon, new_lat) in enumerate(stop_coords):
-        stop_id = sorted_stop_times[i][1]
-        
-        # Find stop in CSV
-        stop_row = df[df['stop_id'] == stop_id]
-        if stop_row.empty:
+    # Look up every stop's current row in one indexed pass; the first row wins for
+    # a duplicated stop_id, as it did with a per-stop boolean mask
+    current = df.drop_duplicates('stop_id').set_index('stop_id').reindex(stop_ids)
+    found = current.index.isin(df['stop_id'])
+    stop_names = current['stop_name'].tolist()
+    old_lon = current['stop_lon'].to_numpy(dtype=float, copy=True)
+    old_lat = current['stop_lat'].to_numpy(dtype=float, copy=True)
+    
+    # Calculate every stop's move distance from its stops.csv position in one
+    # vectorized pass
+    distances = haversine_m(old_lat, old_lon, new_lat, new_lon)
+    
+    # A stop visited more than once (e.g. a loop's first and last stop) is compared
+    # against wherever its previous visit left it, as it would be row by row
+    last_visit = {}
+    for i, stop_id in enumerate(stop_ids):
+        if not found[i]:
+            continue
+        if stop_id in last_visit:
+            j = last_visit[stop_id]
+            if distances[j] > 1.0:
+                old_lon[i], old_lat[i] = new_lon[j], new_lat[j]
+            else:
+                old_lon[i], old_lat[i] = old_lon[j], old_lat[j]
+            distances[i] = haversine_m(old_lat[i], old_lon[i], new_lat[i], new_lon[i])
+        last_visit[stop_id] = i
+    
+    moved = found & (distances > 1.0)  # Only count moves > 1 meter
+    total_moved = int(moved.sum())
+    total_distance = float(distances[moved].sum())
+    
+    # Update the DataFrame with one indexed assignment per column; the last move
+    # of a repeated stop wins, as it did when rows were updated stop by stop
+    moved_idx = np.flatnonzero(moved)
+    new_positions = pd.DataFrame(
+        {'stop_lat': new_lat[moved_idx], 'stop_lon': new_lon[moved_idx]},
+        index=[stop_ids[i] for i in moved_idx],
+    )
+    new_positions = new_positions[~new_positions.index.duplicated(keep='last')]
+    rows = df['stop_id'].isin(new_positions.index)
+    for column in ('stop_lat', 'stop_lon'):
+        df.loc[rows, column] = df.loc[rows, 'stop_id'].map(new_positions[column])
+    
+    updates = []
+    for stop_id, is_found, stop_name, old_pos, new_pos, distance_m, is_moved in zip(
+        stop_ids, found.tolist(), stop_names, zip(old_lon.tolist(), old_lat.tolist()),
+        zip(new_lon.tolist(), new_lat.tolist()), distances.tolist(), moved.tolist(),
+    ):
+        if not is_found:
             updates.append({
                 "stop_id": stop_id,
                 "error": "Stop not found in stops.csv"
             })
             continue
         
-        stop_name = stop_row.iloc[0]['stop_name']
-        old_lon = stop_row.iloc[0]['stop_lon']
-        old_lat = stop_row.iloc[0]['stop_lat']
-        
-        # Calculate distance
-        old_pos = (old_lat, old_lon)
-        new_pos = (new_lat, new_lon)
-        distance_m = geodesic(old_pos, new_pos).meters
-        
-        moved = distance_m > 1.0  # Only count moves > 1 meter
-        if moved:
-            total_moved += 1
-            total_distance += distance_m
-            
-            # Update the DataFrame
-            df.loc[df['stop_id'] == stop_id, 'stop_lat'] = new_lat
-            df.loc[df['stop_id'] == stop_id, 'stop_lon'] = new_lon
-        
         updates.append({
             "stop_id": stop_id,
             "stop_name": stop_name,
-            "old_coords": (old_lon, old_lat),
-            "new_coords": (new_lon, new_lat),
+            "old_coords": old_pos,
+            "new_coords": new_pos,
             "distance_m": distance_m,
-            "moved": moved
+            "moved": is_moved
         })
     
-    # Save updated CSV
-    try:
-        df.to_csv(stops_csv_path, index=False)
-    except Exception as e:
-        return {"error": f"Could not save stops.csv: {e}"}
+    # Save updated CSV, leaving the file untouched when no stop moved
+    if total_moved:
+        try:
+            df.to_csv(stops_csv_path, index=False)
+        except Exception as e:
+            return {"error": f"Could not save stops.csv: {e}"}
     
     # Extract and save nogos if nogos_csv_path provided
     nogos_info = {}
     if nogos_csv_path:
-        nogos_from_url = extract_nogos_from_brouter_url(brouter_url)
         if nogos_from_url and trip.get("shape_id"):
             shape_id = trip["shape_id"]
             
-            # Create nogos.csv if it doesn't exist
-            if not nogos_csv_path.exists():
-                nogos_df = pd.DataFrame(columns=['shape_id', 'stop_lat', 'stop_lon', 'radius'])
-                nogos_df.to_csv(nogos_csv_path, index=False)
-                nogos_info["nogos_csv_created"] = True
-            
             try:
-                # Load existing nogos
-                nogos_df = pd.read_csv(nogos_csv_path)
-                
-                # Remove existing nogos for this shape_id
-                nogos_df = nogos_df[nogos_df['shape_id'] != shape_id]
-                
-                # Add new nogos
-                new_nogos = []
-                for lon, lat, radius in nogos_from_url:
-                    new_nogos.append({
-                        'shape_id': shape_id,
-                        'stop_lat': lat,
-                        'stop_lon': lon,
-                        'radius': radius
-                    })
+                # Replace existing nogos for this shape_id with the new nogos,
+                # creating nogos.csv if it doesn't exist
+                new_nogos = [
+                    {'shape_id': shape_id, 'stop_lat': lat, 'stop_lon': lon, 'radius': radius}
+                    for lon, lat, radius in nogos_from_url
+                ]
                 
                 if new_nogos:
-                    new_nogos_df = pd.DataFrame(new_nogos)
-                    nogos_df = pd.concat([nogos_df, new_nogos_df], ignore_index=True)
-                    nogos_df.to_csv(nogos_csv_path, index=False)
+                    if _replace_shape_rows(nogos_csv_path, ['shape_id', 'stop_lat', 'stop_lon', 'radius'], shape_id, new_nogos):
+                        nogos_info["nogos_csv_created"] = True
                     
                     nogos_info.update({
                         "nogos_updated": True,
@@ -597,19 +700,7 @@ def update_stop_positions_from_url(brouter_url, trip_id, trips, stops_csv_path,
     if guides_csv_path and detected_guides and trip.get("shape_id"):
         shape_id = trip["shape_id"]
         
-        # Create guides.csv if it doesn't exist
-        if not guides_csv_path.exists():
-            guides_df = pd.DataFrame(columns=['shape_id', 'stop_lat', 'stop_lon', 'position', 'order'])
-            guides_df.to_csv(guides_csv_path, index=False)
-            guides_info["guides_csv_created"] = True
-        
         try:
-            # Load existing guides
-            guides_df = pd.read_csv(guides_csv_path)
-            
-            # Remove existing guides for this shape_id
-            guides_df = guides_df[guides_df['shape_id'] != shape_id]
-            
             # Add new guides with their positions in the coordinate sequence
             # Sort detected_guides by original_position to maintain waypoint order
             sorted_guides = sorted(detected_guides, key=lambda x: x[2])
@@ -629,9 +720,9 @@ def update_stop_positions_from_url(brouter_url, trip_id, trips, stops_csv_path,
                 })
             
             if new_guides:
-                new_guides_df = pd.DataFrame(new_guides)
-                guides_df = pd.concat([guides_df, new_guides_df], ignore_index=True)
-                guides_df.to_csv(guides_csv_path, index=False)
+                # Replace existing guides for this shape_id, creating guides.csv if it doesn't exist
+                if _replace_shape_rows(guides_csv_path, ['shape_id', 'stop_lat', 'stop_lon', 'position', 'order'], shape_id, new_guides):
+                    guides_info["guides_csv_created"] = True
                 
                 guides_info.update({
                     "guides_updated": True,
@@ -648,25 +739,12 @@ def update_stop_positions_from_url(brouter_url, trip_id, trips, stops_csv_path,
     if straights_csv_path and straight_indices and trip.get("shape_id"):
         shape_id = trip["shape_id"]
         
-        # Create straights.csv if it doesn't exist
-        if not straights_csv_path.exists():
-            straights_df = pd.DataFrame(columns=['shape_id', 'index'])
-            straights_df.to_csv(straights_csv_path, index=False)
-            straights_info["straights_csv_created"] = True
-        
         try:
-            # Load existing straights
-            straights_df = pd.read_csv(straights_csv_path)
-            
-            # Remove existing straights for this shape_id
-            straights_df = straights_df[straights_df['shape_id'] != shape_id]
-            
-            # Add new straight line indices as separate rows
-            new_straights_data = [{'shape_id': shape_id, 'index': idx} for idx in straight_indices]
-            new_straights = pd.DataFrame(new_straights_data)
-            
-            straights_df = pd.concat([straights_df, new_straights], ignore_index=True)
-            straights_df.to_csv(straights_csv_path, index=False)
+            # Replace existing straights for this shape_id with the new straight line
+            # indices as separate rows, creating straights.csv if it doesn't exist
+            new_straights = [{'shape_id': shape_id, 'index': idx} for idx in straight_indices]
+            if _replace_shape_rows(straights_csv_path, ['shape_id', 'index'], shape_id, new_straights):
+                straights_info["straights_csv_created"] = True
             
             straights_info.update({
                 "straights_updated": True,
@@ -684,7 +762,7 @@ def update_stop_positions_from_url(brouter_url, trip_id, trips, stops_csv_path,
         "total_distance_m": total_distance,
         "avg_distance_m": total_distance / total_moved if total_moved > 0 else 0,
         "updates": updates,
-        "csv_updated": True,
+        "csv_updated": total_moved > 0,
         "straight_indices": straight_indices,
         "nogos_info": nogos_info,
         "guides_info": guides_info,
@@ -15,10 +15,9 @@ Key data structures:
 - CALENDAR/CALENDAR_DATES: Service patterns and exceptions
 """
 
+import csv
+from functools import lru_cache
 from pathlib import Path
-import holidays
-from dateutil.easter import easter
-import pandas as pd
 
 from src.gtfs_lib import DirectionId, RouteTypes, ServiceAvailable, ServiceException
 
@@ -112,6 +111,7 @@ ROUTES = [
 # - direction_id: Direction of travel (0=outbound, 1=inbound)
 # - shape_id: Reference to GeoJSON file for route geometry (optional)
 # - stop_times: Array of (time, stop_id) or (arrival, stop_id, departure) tuples
+#   (normalized to (arrival, stop_id, departure) once TRIPS is defined)
 
 TRIPS = [
     {
@@ -1127,8 +1127,63 @@ TRIPS = [
     },
 ]
 
+
+def _prepare_trips(trips):
+    """
+    Prepare TRIPS for the feed writers in a single pass.
+    
+    Normalizes every stop_times entry in place to (arrival, stop_id, departure)
+    so consumers never have to branch on tuple length; departure defaults to
+    arrival.
+    
+    Args:
+        trips (list): Trip dictionaries with stop_times
+        
+    Returns:
+        tuple: (trips.txt columns, i.e. every trip field except the nested
+               stop_times, and the sorted unique shape_ids referenced by trips)
+    """
+    trip_fields = {}
+    shape_ids = set()
+    for trip in trips:
+        trip["stop_times"] = [
+            (stop[0], stop[1], stop[2] if len(stop) == 3 else stop[0])
+            for stop in trip["stop_times"]
+        ]
+        trip_fields.update(dict.fromkeys(trip))
+        if "shape_id" in trip:
+            shape_ids.add(trip["shape_id"])
+
+    trip_fields.pop("stop_times", None)
+    # Shape IDs are sorted so shapes.txt output is stable
+    return list(trip_fields), tuple(sorted(shape_ids))
+
+
+TRIP_FIELDS, SHAPE_IDS = _prepare_trips(TRIPS)
+
 REPO_DIR = Path(__file__).resolve().parent.parent
-STOPS = pd.read_csv(REPO_DIR / "stops.csv").to_dict(orient="records")
+
+
+def _load_stops(stops_csv_path):
+    """
+    Load stop records from stops.csv with numeric coordinates.
+    
+    Read with the csv module so importing this module doesn't pull in pandas.
+    
+    Args:
+        stops_csv_path (Path): Path to stops.csv
+        
+    Returns:
+        list: Stop dictionaries with float stop_lat and stop_lon
+    """
+    with open(stops_csv_path, newline="", encoding="utf-8") as f:
+        return [
+            {**row, "stop_lat": float(row["stop_lat"]), "stop_lon": float(row["stop_lon"])}
+            for row in csv.DictReader(f)
+        ]
+
+
+STOPS = _load_stops(REPO_DIR / "stops.csv")
 
 CALENDAR = [
     {
@@ -1198,22 +1253,46 @@ CALENDAR = [
 # CALENDAR EXCEPTIONS - Holiday Service Removals
 # =============================================================================
 
-# Generate service exceptions for US federal holidays and Easter
 years = range(2026, 2030)  # Years covered by this GTFS feed
-CALENDAR_DATES = [
-    {
-        "service_id": service_id,  # Apply exception to this service pattern
-        "date": int(d.strftime("%Y%m%d")),  # Holiday date in YYYYMMDD format
-        "exception_type": ServiceException.REMOVED.value,  # Remove service on this date
-    }
-    # Get all US federal holidays plus Easter for the specified years
-    for d in sorted(list(holidays.US(years=years).keys()) + list(map(easter, years)))
-    # Apply holiday exceptions to all service patterns
-    for service_id in [
-        DAILY_SERVICE_ID,
-        TUES_FRI_SERVICE_ID,
-        WEEKDAY_SERVICE_ID,
-        SATURDAY_SERVICE_ID,
-        SUNDAY_SERVICE_ID,
+
+
+# Generate service exceptions for US federal holidays and Easter
+@lru_cache(maxsize=None)
+def _calendar_dates():
+    """
+    Build the holiday service exceptions on first use.
+    
+    holidays and dateutil are imported here rather than at module level, so
+    commands that only need TRIPS or STOPS don't pay for building the holiday
+    tables.
+    
+    Returns:
+        list: calendar_dates records removing every service pattern on each holiday
+    """
+    import holidays
+    from dateutil.easter import easter
+
+    return [
+        {
+            "service_id": service_id,  # Apply exception to this service pattern
+            "date": int(d.strftime("%Y%m%d")),  # Holiday date in YYYYMMDD format
+            "exception_type": ServiceException.REMOVED.value,  # Remove service on this date
+        }
+        # Get all US federal holidays plus Easter for the specified years
+        for d in sorted(list(holidays.US(years=years).keys()) + list(map(easter, years)))
+        # Apply holiday exceptions to all service patterns
+        for service_id in [
+            DAILY_SERVICE_ID,
+            TUES_FRI_SERVICE_ID,
+            WEEKDAY_SERVICE_ID,
+            SATURDAY_SERVICE_ID,
+            SUNDAY_SERVICE_ID,
+        ]
     ]
-]
+
+
+def __getattr__(name):
+    """Resolve CALENDAR_DATES lazily (PEP 562); it stays importable by name."""
+    if name == "CALENDAR_DATES":
+        return _calendar_dates()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -7,12 +7,20 @@ processing transit data. Contains standardized GTFS constants and helper
 functions for working with GeoJSON route shapes.
 """
 
-from enum import Enum
+import mmap
+from concurrent.futures import ThreadPoolExecutor
+from enum import IntEnum
+from functools import lru_cache
+from pathlib import Path
 
-import geojson
+import orjson
 
+# Shape files at least this large are parsed from a memory map rather than
+# read into a bytes copy first
+STREAM_PARSE_MIN_BYTES = 4 * 1024 * 1024
 
-class RouteTypes(Enum):
+
+class RouteTypes(IntEnum):
     """
     GTFS route_type enumeration defining different modes of transportation.
     
@@ -33,7 +41,7 @@ class RouteTypes(Enum):
     )
 
 
-class DirectionId(Enum):
+class DirectionId(IntEnum):
     """
     GTFS direction_id enumeration for trip direction.
     
@@ -44,7 +52,7 @@ class DirectionId(Enum):
     INBOUND = 1  # Travel in the opposite direction (e.g. inbound travel).
 
 
-class BikesAllowed(Enum):
+class BikesAllowed(IntEnum):
     """
     GTFS bikes_allowed enumeration for bicycle accommodation.
     
@@ -55,7 +63,7 @@ class BikesAllowed(Enum):
     NO = 2  # No bicycles are allowed on this trip.
 
 
-class ServiceAvailable(Enum):
+class ServiceAvailable(IntEnum):
     """
     GTFS service availability enumeration for calendar service patterns.
     
@@ -65,7 +73,7 @@ class ServiceAvailable(Enum):
     NO = 0  # Service is not available
 
 
-class ServiceException(Enum):
+class ServiceException(IntEnum):
     """
     GTFS exception_type enumeration for calendar date exceptions.
     
@@ -80,23 +88,94 @@ def linestring_from_geojson(fp):
     """
     Extract LineString coordinates from a GeoJSON file.
     
-    Opens a GeoJSON file and returns the coordinate array from the first
-    feature's LineString geometry. Used for processing route shape files
-    into GTFS shapes.txt format.
+    Opens a GeoJSON file and returns the coordinates of the first feature's
+    LineString geometry. Used for processing route shape files into GTFS
+    shapes.txt format. Results are cached per file and modification time, so an
+    edited file is parsed again, and are returned read-only.
     
     Args:
         fp (str): File path to the GeoJSON file containing route geometry
         
     Returns:
-        list: Array of [longitude, latitude] coordinate pairs representing
-              the route shape points in sequence
+        numpy.ndarray: Float array of shape (N, 2) holding the [longitude, latitude]
+              of each route shape point in sequence; any elevation is dropped
               
     Raises:
         FileNotFoundError: If the specified GeoJSON file doesn't exist
         IndexError: If the GeoJSON file contains no features
         KeyError: If the first feature doesn't contain valid LineString geometry
     """
-    with open(fp, "r", encoding="utf-8") as f:
-        fc = geojson.load(f)  # Load the GeoJSON feature collection
-    # Extract coordinates from the first feature's LineString geometry
-    return fc.features[0].geometry.coordinates
+    path = Path(fp).resolve()
+    stat = path.stat()
+    return _read_linestring(path, stat.st_mtime_ns, stat.st_size)
+
+
+def _load_json_mapped(path):
+    """
+    Parse a JSON file straight from a read-only memory map of it.
+    """
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        # The view must be released before the map can be closed
+        with memoryview(mm) as view:
+            return orjson.loads(view)
+
+
+@lru_cache(maxsize=256)
+def _read_linestring(path, mtime_ns, size):
+    """
+    Parse a GeoJSON shape file, memoized on its absolute path and modification time.
+    """
+    import numpy as np
+
+    if size < STREAM_PARSE_MIN_BYTES:
+        # Load the whole GeoJSON feature collection; orjson is faster for small files
+        feature = orjson.loads(path.read_bytes())["features"][0]
+    else:
+        feature = _load_json_mapped(path)["features"][0]
+    # Extract coordinates from the first feature's LineString geometry, rounded
+    # to the 6 decimal places (~0.1 m) the geojson package used to apply. Points
+    # may or may not carry an elevation, so only lon/lat go into the array
+    coords = feature["geometry"]["coordinates"]
+    points = np.array([(round(point[0], 6), round(point[1], 6)) for point in coords], dtype=np.float64).reshape(-1, 2)
+    points.flags.writeable = False  # Shared through the cache
+    return points
+
+
+def linestrings_from_geojson_collection(paths, max_workers=8):
+    """
+    Extract LineString coordinates from several GeoJSON files at once.
+    
+    Files are parsed concurrently since reads overlap across threads; a handful
+    of workers is enough before the disk becomes the bottleneck. Each file goes
+    through linestring_from_geojson, so repeated paths are served from its cache.
+    
+    Args:
+        paths: Sequence of GeoJSON file paths
+        max_workers (int): Maximum number of parsing threads
+        
+    Returns:
+        list: One (N, 2) [longitude, latitude] array per path, in the order of paths
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(linestring_from_geojson, paths))
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in meters between coordinates given in degrees.
+    
+    Accepts scalars or NumPy arrays (broadcast against each other), so every
+    pair in a batch is measured in a single vectorized call.
+    
+    Args:
+        lat1, lon1: Latitude/longitude of the first point(s)
+        lat2, lon2: Latitude/longitude of the second point(s)
+        
+    Returns:
+        Distance(s) in meters on a spherical Earth (radius 6,371,000 m)
+    """
+    import numpy as np
+
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(x, dtype=float)) for x in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371000.0 * np.arcsin(np.sqrt(a))